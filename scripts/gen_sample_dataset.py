@@ -1,7 +1,10 @@
 #!/usr/bin/env python3
 import argparse
+import itertools
+import os
 import random
 import re
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
 
 
@@ -10,73 +13,94 @@ def parse_args():
     p.add_argument("--out_dir", default="datasets/sample")
     p.add_argument("--seed", type=int, default=1)
     p.add_argument("--per_family", type=int, default=80)
+    p.add_argument("--workers", type=int, default=os.cpu_count() or 1)
     return p.parse_args()
 
 
-def choose(rng, seq):
-    return seq[rng.randrange(len(seq))]
+FAMILY_WEIGHTS = {
+    "and_dominant": [("AND", 0.60), ("OR", 0.12), ("XOR", 0.08), ("XNOR", 0.08), ("NOT", 0.08), ("BUF", 0.04)],
+    "xor_dominant": [("AND", 0.10), ("OR", 0.10), ("XOR", 0.55), ("XNOR", 0.15), ("NOT", 0.06), ("BUF", 0.04)],
+    "or_dominant": [("AND", 0.12), ("OR", 0.60), ("XOR", 0.08), ("XNOR", 0.06), ("NOT", 0.10), ("BUF", 0.04)],
+    "xnor_dominant": [("AND", 0.10), ("OR", 0.08), ("XOR", 0.12), ("XNOR", 0.55), ("NOT", 0.10), ("BUF", 0.05)],
+    "nand_style": [("AND", 0.45), ("OR", 0.10), ("XOR", 0.10), ("XNOR", 0.05), ("NOT", 0.25), ("BUF", 0.05)],
+    "mixed_control": [("AND", 0.25), ("OR", 0.25), ("XOR", 0.15), ("XNOR", 0.10), ("NOT", 0.20), ("BUF", 0.05)],
+}
 
 
-def weighted_choice(rng: random.Random, choices):
-    total = sum(w for _, w in choices)
-    x = rng.random() * total
-    cur = 0.0
-    for item, w in choices:
-        cur += w
-        if x <= cur:
-            return item
-    return choices[-1][0]
+def build_cdf(choices):
+    ops = [op for op, _ in choices]
+    cum = list(itertools.accumulate(w for _, w in choices))
+    return ops, cum
+
+
+# cumulative weights per family, sampled in one batch per instance
+FAMILY_CDF = {fam: build_cdf(choices) for fam, choices in FAMILY_WEIGHTS.items()}
 
 
 def gen_bench_instance(rng: random.Random, idx: int, family: str) -> str:
     n_inputs = rng.randint(6, 16)
     n_nodes = rng.randint(16, 48)
-    inputs = [f"x{i}" for i in range(n_inputs)]
-    lines = [f"INPUT({name})" for name in inputs]
-    names = list(inputs)
-
-    weights = {
-        "and_dominant": [("AND", 0.60), ("OR", 0.12), ("XOR", 0.08), ("XNOR", 0.08), ("NOT", 0.08), ("BUF", 0.04)],
-        "xor_dominant": [("AND", 0.10), ("OR", 0.10), ("XOR", 0.55), ("XNOR", 0.15), ("NOT", 0.06), ("BUF", 0.04)],
-        "or_dominant": [("AND", 0.12), ("OR", 0.60), ("XOR", 0.08), ("XNOR", 0.06), ("NOT", 0.10), ("BUF", 0.04)],
-        "xnor_dominant": [("AND", 0.10), ("OR", 0.08), ("XOR", 0.12), ("XNOR", 0.55), ("NOT", 0.10), ("BUF", 0.05)],
-        "nand_style": [("AND", 0.45), ("OR", 0.10), ("XOR", 0.10), ("XNOR", 0.05), ("NOT", 0.25), ("BUF", 0.05)],
-        "mixed_control": [("AND", 0.25), ("OR", 0.25), ("XOR", 0.15), ("XNOR", 0.10), ("NOT", 0.20), ("BUF", 0.05)],
-    }[family]
-
-    for i in range(n_nodes):
-        lhs = f"n{family}_{idx}_{i}"
-        op = weighted_choice(rng, weights)
+    nand_style = family == "nand_style"
+
+    # preallocated; every name has exactly one line, so n counts both.
+    # nand_style may add two extra names per node.
+    cap = n_inputs + (3 if nand_style else 1) * n_nodes
+    names = [None] * cap
+    lines = [None] * (cap + 1)
+    for i in range(n_inputs):
+        names[i] = f"x{i}"
+        lines[i] = f"INPUT(x{i})"
+    n = n_inputs
+
+    # draw every node op up front; names grow inside the loop so stay scalar
+    ops, cum = FAMILY_CDF[family]
+    node_ops = rng.choices(ops, cum_weights=cum, k=n_nodes)
+    # per-instance name prefix, formatted once
+    tag = f"{family}_{idx}_"
+
+    for i, op in enumerate(node_ops):
+        lhs = f"n{tag}{i}"
         if op in ("NOT", "BUF"):
-            a = choose(rng, names)
+            a = names[rng.randrange(n)]
             line = f"{lhs} = {op}({a})"
         else:
-            a = choose(rng, names)
-            b = choose(rng, names)
+            a = names[rng.randrange(n)]
+            b = names[rng.randrange(n)]
             line = f"{lhs} = {op}({a},{b})"
-        lines.append(line)
-        names.append(lhs)
+        lines[n] = line
+        names[n] = lhs
+        n += 1
 
         # extra nand-like structure
-        if family == "nand_style" and rng.random() < 0.25:
-            lhs_and = f"na_{family}_{idx}_{i}"
-            lhs_not = f"nn_{family}_{idx}_{i}"
-            a = choose(rng, names)
-            b = choose(rng, names)
-            lines.append(f"{lhs_and} = AND({a},{b})")
-            lines.append(f"{lhs_not} = NOT({lhs_and})")
-            names.append(lhs_and)
-            names.append(lhs_not)
-
-    out_name = choose(rng, names)
-    lines.append(f"OUTPUT({out_name})")
-    return "\n".join(lines) + "\n"
+        if nand_style and rng.random() < 0.25:
+            lhs_and = f"na_{tag}{i}"
+            lhs_not = f"nn_{tag}{i}"
+            a = names[rng.randrange(n)]
+            b = names[rng.randrange(n)]
+            lines[n] = f"{lhs_and} = AND({a},{b})"
+            lines[n + 1] = f"{lhs_not} = NOT({lhs_and})"
+            names[n] = lhs_and
+            names[n + 1] = lhs_not
+            n += 2
+
+    out_name = names[rng.randrange(n)]
+    lines[n] = f"OUTPUT({out_name})"
+    return "\n".join(lines[: n + 1]) + "\n"
 
 
 def lit_from_id(node_id: int, neg: bool) -> int:
     return node_id * 2 + (1 if neg else 0)
 
 
+def gen_family_shard(seed: int, family: str, count: int) -> list[tuple[str, bytes]]:
+    # each family owns its rng so output does not depend on worker count
+    rng = random.Random(seed)
+    out = []
+    for i in range(count):
+        out.append((f"{family}_{i:04d}.bench", gen_bench_instance(rng, i, family).encode("utf-8")))
+    return out
+
+
 def main():
     args = parse_args()
     rng = random.Random(args.seed)
@@ -93,21 +117,30 @@ def main():
         "mixed_control",
     ]
 
-    total = 0
-    for fam in families:
-        fd = fam_dir / fam
-        fd.mkdir(parents=True, exist_ok=True)
-        for i in range(args.per_family):
-            text = gen_bench_instance(rng, i, fam)
-            (fd / f"{fam}_{i:04d}.bench").write_text(text, encoding="utf-8")
-            total += 1
+    seeds = [rng.randrange(2**63) for _ in families]
+    workers = max(1, min(args.workers, len(families)))
+    if workers == 1:
+        shards = [gen_family_shard(s, fam, args.per_family) for s, fam in zip(seeds, families)]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as ex:
+            shards = list(ex.map(gen_family_shard, seeds, families, [args.per_family] * len(families)))
 
     # one flat directory for simple benchmark commands
     flat_dir = root / "bench_all"
     flat_dir.mkdir(parents=True, exist_ok=True)
-    for p in fam_dir.rglob("*.bench"):
-        dst = flat_dir / p.name
-        dst.write_text(p.read_text(encoding="utf-8"), encoding="utf-8")
+
+    pending: list[tuple[Path, bytes]] = []
+    for fam, shard in zip(families, shards):
+        fd = fam_dir / fam
+        fd.mkdir(parents=True, exist_ok=True)
+        for name, buf in shard:
+            pending.append((fd / name, buf))
+            pending.append((flat_dir / name, buf))
+    total = sum(len(shard) for shard in shards)
+
+    # file writes release the gil, so threads overlap them
+    with ThreadPoolExecutor(max_workers=min(8, os.cpu_count() or 1)) as ex:
+        list(ex.map(lambda pb: pb[0].write_bytes(pb[1]), pending))
 
     print(f"generated bench_total={total} families={len(families)} seed={args.seed}")
     print(f"flat_bench={len(list(flat_dir.glob('*.bench')))}")
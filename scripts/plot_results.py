@@ -2,11 +2,20 @@
 import argparse
 import os
 import re
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from importlib.util import find_spec
 from pathlib import Path
 
+import matplotlib
+
+matplotlib.use("Agg")
 import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
+from pandas.api.types import is_numeric_dtype
+
+plt.rcParams["path.simplify_threshold"] = 1.0
 
 
 def parse_args():
@@ -31,37 +40,65 @@ NUM_COLS = [
     "cnf_vars",
     "cnf_clauses",
 ]
-
-
-def infer_family_from_file(path_text: str, root_hint: Path) -> str:
+USECOLS = ["path", "status", *NUM_COLS]
+DTYPES = {"path": "string", "status": "category"}
+OP_RE = re.compile(rb"=\s*([A-Z]+)\(")
+
+
+def read_results(path: str) -> pd.DataFrame:
+    if path.endswith(".parquet"):
+        # columns arrive typed, so only trim and align dtypes with the csv path
+        df = pd.read_parquet(path, engine="pyarrow")
+        df = df[[c for c in USECOLS if c in df.columns]]
+        return df.astype({c: t for c, t in DTYPES.items() if c in df.columns})
+    if find_spec("pyarrow") is None:
+        return pd.read_csv(path, usecols=lambda c: c in USECOLS, dtype=DTYPES, low_memory=False)
+    # multi-threaded arrow parser; it only takes usecols as a list of present names.
+    # no dtype= here: it casts every column and fails on empty metric cells
+    header = pd.read_csv(path, nrows=0).columns
+    usecols = [c for c in USECOLS if c in header]
+    df = pd.read_csv(path, engine="pyarrow", usecols=usecols)
+    return df.astype({c: t for c, t in DTYPES.items() if c in df.columns})
+
+
+def infer_family_from_file(path_text: str) -> str | None:
+    # cheap string check so non-bench rows skip the Path and stat
+    if not path_text.lower().endswith(".bench"):
+        return None
     p = Path(path_text)
     if p.exists() and p.suffix.lower() == ".bench":
-        text = p.read_text(encoding="utf-8", errors="ignore")
-        ops = re.findall(r"=\s*([A-Z]+)\(", text)
-        counts = {}
-        for op in ops:
-            counts[op] = counts.get(op, 0) + 1
-        if counts:
-            top = max(counts.items(), key=lambda x: x[1])[0]
-            return top.lower() + "_dominant"
-
-    # fallback path rule
-    p2 = Path(path_text.replace("\\", "/"))
-    parts = p2.parts
-    root_parts = root_hint.parts
-    if len(parts) > len(root_parts) + 1 and parts[: len(root_parts)] == root_parts:
-        return parts[len(root_parts)]
-    stem = p2.stem
-    if "_" in stem:
-        return stem.split("_", 1)[0]
-    if "-" in stem:
-        return stem.split("-", 1)[0]
-    return stem
+        # ops are ascii, so match on raw bytes and skip decoding the file
+        top = Counter(OP_RE.findall(p.read_bytes())).most_common(1)
+        if top:
+            return top[0][0].decode("ascii").lower() + "_dominant"
+    return None
+
+
+def norm_path(path_text: str) -> str:
+    # same components as Path: "\\" as "/", drop empty and "." parts, keep ".."
+    p = path_text.replace("\\", "/")
+    lead = "/" if p.startswith("/") else ""
+    return lead + "/".join(c for c in p.split("/") if c not in ("", "."))
+
+
+def infer_family_from_path(paths: pd.Series, root_hint: Path) -> pd.Series:
+    # fallback path rule: first dir under root_hint, else stem up to "_" or "-".
+    # normalize each distinct path once so the prefix test matches commonpath's form
+    s = paths.map({p: norm_path(p) for p in paths.unique()})
+    root = root_hint.as_posix()
+    prefix = "" if root == "." else root.rstrip("/") + "/"
+    rest = s.str.slice(len(prefix))
+    under_root = s.str.startswith(prefix) & rest.str.contains("/", regex=False)
+    stem = s.str.rpartition("/")[2].str.replace(r"(?<=.)\.[^.]+$", "", regex=True)
+    stem_family = stem.str.partition("_")[0].where(
+        stem.str.contains("_", regex=False), stem.str.partition("-")[0]
+    )
+    return rest.str.partition("/")[0].where(under_root, stem_family)
 
 
 def size_buckets(ok_df: pd.DataFrame) -> np.ndarray:
-    vals = ok_df["cnf_clauses"].dropna().astype(float)
-    if vals.empty:
+    vals = ok_df["cnf_clauses"].dropna().to_numpy(dtype=float)
+    if len(vals) == 0:
         return np.array([0.0, 1.0])
     q = np.unique(np.quantile(vals, [0.0, 0.25, 0.5, 0.75, 1.0]))
     if len(q) < 2:
@@ -71,144 +108,158 @@ def size_buckets(ok_df: pd.DataFrame) -> np.ndarray:
     return q
 
 
+def bucket_codes(x: np.ndarray, edges: np.ndarray) -> np.ndarray:
+    # right-closed bins with the lowest edge included, as pd.cut(include_lowest=True)
+    codes = np.searchsorted(edges, x, side="left") - 1
+    codes[x == edges[0]] = 0
+    codes[(x < edges[0]) | (x > edges[-1]) | np.isnan(x)] = -1
+    return codes
+
+
+def ratio(num: np.ndarray, den: np.ndarray) -> np.ndarray:
+    # same as num / den.clip(lower=1) on raw arrays
+    return num / np.maximum(den, 1.0)
+
+
 def add_metrics(df: pd.DataFrame, root_hint: Path) -> pd.DataFrame:
-    out = df.copy()
-    for c in NUM_COLS:
-        if c in out.columns:
-            out[c] = pd.to_numeric(out[c], errors="coerce")
-    out["family"] = out["path"].fillna("").map(lambda p: infer_family_from_file(str(p), root_hint))
-    out["time_per_call_ms"] = out["wall_ms"] / out["solve_calls"].clip(lower=1)
-    out["vars_per_clause"] = out["cnf_vars"] / out["cnf_clauses"].clip(lower=1)
-    out["cone_frac"] = out["cone_inputs"] / out["aig_inputs"].clip(lower=1)
-    out["ands_per_cone_in"] = out["aig_ands"] / out["cone_inputs"].clip(lower=1)
+    # fills derived columns on df in place and returns it
+    # the csv parser types clean numeric columns; coerce only the leftovers
+    present = [c for c in NUM_COLS if c in df.columns and not is_numeric_dtype(df[c])]
+    if present:
+        df[present] = df[present].apply(pd.to_numeric, errors="coerce")
+    paths = df["path"].fillna("").astype(str)
+    # probe each distinct file once; results repeat across backends and seeds.
+    # reads block on disk, so fan them out over threads
+    bench = [p for p in paths.unique() if p.lower().endswith(".bench")]
+    probed = {}
+    if bench:
+        with ThreadPoolExecutor(max_workers=min(32, (os.cpu_count() or 1) * 4)) as ex:
+            probed = dict(zip(bench, ex.map(infer_family_from_file, bench)))
+    df["family"] = paths.map(probed).fillna(infer_family_from_path(paths, root_hint)).astype("category")
+
+    wall_ms, solve_calls, cnf_vars, cnf_clauses, cone_inputs, aig_inputs, aig_ands = (
+        df[c].to_numpy(dtype=np.float64, copy=False)
+        for c in ("wall_ms", "solve_calls", "cnf_vars", "cnf_clauses", "cone_inputs", "aig_inputs", "aig_ands")
+    )
+    cone_frac = ratio(cone_inputs, aig_inputs)
+    ands_per_cone_in = ratio(aig_ands, cone_inputs)
+    df["time_per_call_ms"] = ratio(wall_ms, solve_calls)
+    df["vars_per_clause"] = ratio(cnf_vars, cnf_clauses)
+    df["cone_frac"] = cone_frac
+    df["ands_per_cone_in"] = ands_per_cone_in
     # diversity proxy from cone pressure
-    out["diversity_score"] = out["cone_frac"] * out["ands_per_cone_in"]
-    return out
-
-
-def plot_time_hist(ok_df: pd.DataFrame, out_path: Path):
-    plt.figure(figsize=(10, 4.5))
-    gobj = ok_df.groupby("size_bucket", observed=False)
-    groups = [g["wall_ms"].values for _, g in gobj]
-    labels = [str(k) for k, _ in gobj]
-    if groups:
-        plt.boxplot(groups, tick_labels=labels, showfliers=False)
-    med = ok_df["wall_ms"].median()
-    p90 = ok_df["wall_ms"].quantile(0.9)
-    plt.title(f"wall_ms by cnf size bucket | median={med:.2f} p90={p90:.2f}")
-    plt.xlabel("cnf size bucket")
-    plt.ylabel("wall_ms")
-    plt.xticks(rotation=20, ha="right")
-    plt.tight_layout()
-    plt.savefig(out_path)
-    plt.close()
-
-
-def plot_solve_calls_hist(ok_df: pd.DataFrame, out_path: Path):
-    plt.figure(figsize=(10, 4.5))
-    gobj = ok_df.groupby("size_bucket", observed=False)
-    groups = [g["solve_calls"].values for _, g in gobj]
-    labels = [str(k) for k, _ in gobj]
-    if groups:
-        plt.boxplot(groups, tick_labels=labels, showfliers=False)
-    plt.title("solve_calls by cnf size bucket")
-    plt.xlabel("cnf size bucket")
-    plt.ylabel("solve_calls")
-    plt.xticks(rotation=20, ha="right")
-    plt.tight_layout()
-    plt.savefig(out_path)
-    plt.close()
-
-
-def plot_time_vs_vars_per_clause(ok_df: pd.DataFrame, out_path: Path):
-    plt.figure(figsize=(9, 5))
-    d = ok_df.dropna(subset=["vars_per_clause", "time_per_call_ms", "diversity_score"]).copy()
+    df["diversity_score"] = cone_frac * ands_per_cone_in
+    return df
+
+
+def plot_time_hist(ax, groups: list, labels: list, stats: tuple, out_path: Path):
+    ax.clear()
+    ax.figure.set_size_inches(10, 4.5)
+    # no rows: skip the boxes but still write the titled figure
+    if any(len(g) for g in groups):
+        ax.boxplot(groups, tick_labels=labels, showfliers=False)
+    med, p90 = stats
+    ax.set_title(f"wall_ms by cnf size bucket | median={med:.2f} p90={p90:.2f}")
+    ax.set_xlabel("cnf size bucket")
+    ax.set_ylabel("wall_ms")
+    plt.setp(ax.get_xticklabels(), rotation=20, ha="right")
+    ax.figure.savefig(out_path, dpi=90)
+
+
+def plot_solve_calls_hist(ax, groups: list, labels: list, out_path: Path):
+    ax.clear()
+    ax.figure.set_size_inches(10, 4.5)
+    if any(len(g) for g in groups):
+        ax.boxplot(groups, tick_labels=labels, showfliers=False)
+    ax.set_title("solve_calls by cnf size bucket")
+    ax.set_xlabel("cnf size bucket")
+    ax.set_ylabel("solve_calls")
+    plt.setp(ax.get_xticklabels(), rotation=20, ha="right")
+    ax.figure.savefig(out_path, dpi=90)
+
+
+def plot_time_vs_vars_per_clause(ax, ok_df: pd.DataFrame, out_path: Path):
+    ax.clear()
+    ax.figure.set_size_inches(9, 5)
+    d = ok_df.dropna(subset=["vars_per_clause", "time_per_call_ms", "diversity_score"])
     if d.empty:
-        plt.title("time per call vs vars per clause and diversity")
-        plt.tight_layout()
-        plt.savefig(out_path)
-        plt.close()
+        ax.set_title("time per call vs vars per clause and diversity")
+        ax.figure.savefig(out_path, dpi=90)
         return
 
     # color by diversity bucket
-    q = np.unique(np.quantile(d["diversity_score"], [0.0, 0.33, 0.66, 1.0]))
+    q = np.unique(np.quantile(d["diversity_score"].to_numpy(), [0.0, 0.33, 0.66, 1.0]))
     if len(q) < 2:
         q = np.array([d["diversity_score"].min(), d["diversity_score"].max() + 1e-9])
-    d["div_bucket"] = pd.cut(d["diversity_score"], bins=q, include_lowest=True, duplicates="drop")
+    # assign() returns a new frame, so this never writes through to ok_df
+    d = d.assign(div_bucket=pd.cut(d["diversity_score"], bins=q, include_lowest=True, duplicates="drop"))
     for key, group in d.groupby("div_bucket", observed=False):
-        plt.scatter(group["cnf_clauses"], group["wall_ms"], s=25, label=str(key), alpha=0.8)
-    x = d["vars_per_clause"].dropna()
-    y = d["time_per_call_ms"].dropna()
+        ax.scatter(group["cnf_clauses"], group["wall_ms"], s=25, label=str(key), alpha=0.8, rasterized=True)
+    x = d["vars_per_clause"]
     if len(x) >= 4:
         bins = np.unique(np.quantile(x, np.linspace(0.0, 1.0, 8)))
         if len(bins) >= 2:
             idx = np.digitize(x, bins[1:-1], right=True)
-            med_x, med_y = [], []
-            for b in sorted(set(idx)):
-                mask = idx == b
-                med_x.append(np.median(x[mask]))
-                med_y.append(np.median(y[mask]))
-            plt.plot(med_x, med_y, linewidth=2, label="binned median")
-    plt.title("time_per_call_ms vs vars_per_clause with diversity")
-    plt.xlabel("vars_per_clause")
-    plt.ylabel("time_per_call_ms")
-    if len(d) > 0:
-        plt.legend()
-    plt.tight_layout()
-    plt.savefig(out_path)
-    plt.close()
-
-
-def plot_family_summary(ok_df: pd.DataFrame, out_path: Path, min_n: int = 5):
-    g = ok_df.groupby("family")["wall_ms"]
-    agg = g.agg(["count", "median", lambda x: x.quantile(0.9)]).reset_index()
-    agg.columns = ["family", "count", "median", "p90"]
+            med = d.groupby(idx)[["vars_per_clause", "time_per_call_ms"]].median()
+            ax.plot(med["vars_per_clause"], med["time_per_call_ms"], linewidth=2, label="binned median")
+    ax.set_title("time_per_call_ms vs vars_per_clause with diversity")
+    ax.set_xlabel("vars_per_clause")
+    ax.set_ylabel("time_per_call_ms")
+    ax.legend()
+    ax.figure.savefig(out_path, dpi=90)
+
+
+def plot_family_summary(ax, ok_df: pd.DataFrame, out_path: Path, min_n: int = 5):
+    g = ok_df.groupby("family", observed=True)["wall_ms"]
+    # named reductions stay on the cython groupby path; a lambda would not
+    agg = g.agg(["count", "median"])
+    agg["p90"] = g.quantile(0.9)
+    agg = agg.reset_index()
     agg = agg[agg["count"] >= min_n].sort_values("median")
+    ax.clear()
     if agg.empty:
-        plt.figure(figsize=(8, 4))
-        plt.title("family wall_ms summary (count >= 5)")
-        plt.tight_layout()
-        plt.savefig(out_path)
-        plt.close()
+        ax.figure.set_size_inches(8, 4)
+        ax.set_title("family wall_ms summary (count >= 5)")
+        ax.figure.savefig(out_path, dpi=90)
         return
-    plt.figure(figsize=(10, 5.5))
+    ax.figure.set_size_inches(10, 5.5)
     x = np.arange(len(agg))
-    plt.plot(x, agg["median"], marker="o", label="median wall_ms")
-    plt.plot(x, agg["p90"], marker="o", label="p90 wall_ms")
-    plt.xticks(x, agg["family"], rotation=20, ha="right")
-    plt.title("model count time by circuit family")
-    plt.ylabel("wall_ms")
-    plt.legend()
-    plt.tight_layout()
-    plt.savefig(out_path)
-    plt.close()
-
-
-def write_report(df: pd.DataFrame, ok_df: pd.DataFrame, out_path: Path):
+    ax.plot(x, agg["median"], marker="o", label="median wall_ms")
+    ax.plot(x, agg["p90"], marker="o", label="p90 wall_ms")
+    ax.set_xticks(x, agg["family"], rotation=20, ha="right")
+    ax.set_title("model count time by circuit family")
+    ax.set_ylabel("wall_ms")
+    ax.legend()
+    ax.figure.savefig(out_path, dpi=90)
+
+
+def write_report(
+    df: pd.DataFrame,
+    ok_df: pd.DataFrame,
+    is_ok: np.ndarray,
+    is_timeout: np.ndarray,
+    wall_stats: tuple,
+    out_path: Path,
+):
     total = len(df)
-    ok_n = int((df["status"] == "ok").sum())
-    timeout_n = int((df["status"] == "timeout").sum())
-    med = ok_df["wall_ms"].median() if not ok_df.empty else float("nan")
-    p90 = ok_df["wall_ms"].quantile(0.9) if not ok_df.empty else float("nan")
-
-    fam = ok_df.groupby("family")["wall_ms"].agg(["count", "median"]).reset_index()
-    fam_best = fam.sort_values("median").head(5)
-    fam_worst = fam.sort_values("median", ascending=False).head(5)
-
-    largest_bucket = (
-        df["size_bucket_all"].dropna().astype(str).sort_values().iloc[-1]
-        if df["size_bucket_all"].notna().any()
-        else ""
-    )
-    largest = df[df["size_bucket_all"].astype(str) == largest_bucket]
+    ok_n = int(is_ok.sum())
+    timeout_n = int(is_timeout.sum())
+    med, p90 = wall_stats
+
+    fam = ok_df.groupby("family", observed=True)["wall_ms"].agg(["count", "median"])
+    fam_best = fam.nsmallest(5, "median")
+    fam_worst = fam.nlargest(5, "median")
+
+    # string max over the buckets present, compared by code instead of per-row str
+    codes = df["size_bucket_all"].cat.codes.to_numpy()
+    categories = df["size_bucket_all"].cat.categories
+    present = {str(categories[c]): c for c in np.unique(codes[codes >= 0])}
+    largest_bucket = max(present) if present else ""
+    in_largest = codes == present[largest_bucket] if present else np.zeros(len(df), dtype=bool)
     largest_med = (
-        largest[largest["status"] == "ok"]["wall_ms"].median()
-        if not largest.empty
-        else float("nan")
-    )
-    largest_timeout = (
-        (largest["status"] == "timeout").mean() if not largest.empty else float("nan")
+        df.loc[in_largest & is_ok, "wall_ms"].median() if in_largest.any() else float("nan")
     )
+    largest_timeout = is_timeout[in_largest].mean() if in_largest.any() else float("nan")
 
     lines = []
     lines.append(f"dataset_rows: {total}")
@@ -217,11 +268,15 @@ def write_report(df: pd.DataFrame, ok_df: pd.DataFrame, out_path: Path):
     lines.append(f"median_wall_ms_ok: {med:.3f}" if pd.notna(med) else "median_wall_ms_ok: nan")
     lines.append(f"p90_wall_ms_ok: {p90:.3f}" if pd.notna(p90) else "p90_wall_ms_ok: nan")
     lines.append("best_families_by_median_wall_ms:")
-    for _, r in fam_best.iterrows():
-        lines.append(f"  {r['family']}: median={r['median']:.3f}, count={int(r['count'])}")
+    lines.extend(
+        f"  {f}: median={m:.3f}, count={int(c)}"
+        for f, m, c in zip(fam_best.index, fam_best["median"].to_numpy(), fam_best["count"].to_numpy())
+    )
     lines.append("worst_families_by_median_wall_ms:")
-    for _, r in fam_worst.iterrows():
-        lines.append(f"  {r['family']}: median={r['median']:.3f}, count={int(r['count'])}")
+    lines.extend(
+        f"  {f}: median={m:.3f}, count={int(c)}"
+        for f, m, c in zip(fam_worst.index, fam_worst["median"].to_numpy(), fam_worst["count"].to_numpy())
+    )
     lines.append(f"largest_size_bucket: {largest_bucket}")
     lines.append(
         f"largest_bucket_median_wall_ms_ok: {largest_med:.3f}"
@@ -246,28 +301,49 @@ def main():
     args = parse_args()
     out_dir = Path(args.out_dir)
     out_dir.mkdir(parents=True, exist_ok=True)
-    df = pd.read_csv(args.csv)
+    df = read_results(args.csv)
 
-    root_hint = Path(os.path.commonpath([str(p).replace("\\", "/") for p in df["path"].dropna()]))
+    # paths repeat per backend/seed; the common root only needs the distinct ones
+    uniq_paths = df["path"].dropna().unique()
+    root_hint = Path(os.path.commonpath([str(p).replace("\\", "/") for p in uniq_paths]))
     df = add_metrics(df, root_hint)
-    ok_df = df[df["status"] == "ok"].copy()
-
-    bucket_idx = size_buckets(ok_df if not ok_df.empty else df.fillna(0))
+    # status is categorical from read_results; masks computed once and reused
+    is_ok = df["status"].eq("ok").to_numpy()
+    is_timeout = df["status"].eq("timeout").to_numpy()
+    # masking already materializes the rows; the column is added via assign() below
+    ok_df = df[is_ok]
+
+    bucket_idx = size_buckets(ok_df if not ok_df.empty else df.fillna({"cnf_clauses": 0}))
+    # codes from searchsorted; only the k bucket intervals are built, not one per row
+    bucket_cats = pd.cut(bucket_idx, bins=bucket_idx, include_lowest=True).categories
+    df["size_bucket_all"] = pd.Categorical.from_codes(
+        bucket_codes(df["cnf_clauses"].to_numpy(dtype=float), bucket_idx), categories=bucket_cats
+    )
+    # ok rows are a subset, so reuse the full cut instead of cutting again
     if not ok_df.empty:
-        ok_df["size_bucket"] = pd.cut(
-            ok_df["cnf_clauses"], bins=bucket_idx, include_lowest=True, duplicates="drop"
-        )
+        ok_df = ok_df.assign(size_bucket=df.loc[is_ok, "size_bucket_all"])
     else:
-        ok_df["size_bucket"] = pd.Series(dtype="object")
-    df["size_bucket_all"] = pd.cut(
-        df["cnf_clauses"], bins=bucket_idx, include_lowest=True, duplicates="drop"
-    )
-
-    plot_time_hist(ok_df, out_dir / "time_hist.png")
-    plot_solve_calls_hist(ok_df, out_dir / "solve_calls_hist.png")
-    plot_time_vs_vars_per_clause(ok_df, out_dir / "time_vs_cnf.png")
-    plot_family_summary(ok_df, out_dir / "family_summary.png", min_n=5)
-    write_report(df, ok_df, out_dir / "report.md")
+        ok_df = ok_df.assign(size_bucket=pd.Series(dtype="object"))
+
+    # both bucket plots share one groupby pass
+    wall_groups, calls_groups, bucket_labels = [], [], []
+    for key, g in ok_df.groupby("size_bucket", observed=False, sort=True):
+        wall_groups.append(g["wall_ms"].to_numpy())
+        calls_groups.append(g["solve_calls"].to_numpy())
+        bucket_labels.append(str(key))
+    # median and p90 from one partition pass, shared by the plot title and report
+    wall_ok = ok_df["wall_ms"].dropna().to_numpy(dtype=float)
+    wall_stats = tuple(np.quantile(wall_ok, [0.5, 0.9])) if len(wall_ok) else (np.nan, np.nan)
+    # one figure reused by every plotter
+    fig, ax = plt.subplots(figsize=(10, 4.5))
+    # fixed margins instead of a tight_layout solve per plot
+    fig.subplots_adjust(left=0.08, right=0.98, bottom=0.18, top=0.92)
+    plot_time_hist(ax, wall_groups, bucket_labels, wall_stats, out_dir / "time_hist.png")
+    plot_solve_calls_hist(ax, calls_groups, bucket_labels, out_dir / "solve_calls_hist.png")
+    plot_time_vs_vars_per_clause(ax, ok_df, out_dir / "time_vs_cnf.png")
+    plot_family_summary(ax, ok_df, out_dir / "family_summary.png", min_n=5)
+    plt.close(fig)
+    write_report(df, ok_df, is_ok, is_timeout, wall_stats, out_dir / "report.md")
 
 
 if __name__ == "__main__":